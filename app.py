@@ -1,7 +1,12 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
+import numpy as np
+import plotly.graph_objects as go
 
 # ---------------------------------------------------------
 # Helper Functions
@@ -23,42 +28,101 @@ def categorize_storey_range(storey):
             return "Unknown"
     return "Unknown"
 
-def extract_lease_years(lease_text):
-    """Extract numeric years from 'remaining_lease'."""
-    if isinstance(lease_text, str):
-        try:
-            years = int(lease_text.split('year')[0].strip())
-            return years
-        except Exception:
-            return None
-    return None
-
-def categorize_remaining_lease(years):
-    """Categorize the lease years into buckets."""
-    if years is None:
-        return "Unknown"
-    if years < 60:
-        return "<60 years"
-    elif 60 <= years < 70:
-        return "60-69 years"
-    elif 70 <= years < 80:
-        return "70-79 years"
-    elif 80 <= years < 90:
-        return "80-89 years"
-    else:
-        return "90+ years"
+LEASE_ORDER = ["<60 years", "60-69 years", "70-79 years", "80-89 years", "90+ years"]
+LEASE_BINS = [-np.inf, 60, 70, 80, 90, np.inf]
+
+CATEGORY_COLUMNS = ('town', 'flat_type', 'floor_level_category', 'lease_category', 'month')
+
+def to_categories(df):
+    """Store the low-cardinality filter columns as pandas categoricals."""
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    return df
 
 # ---------------------------------------------------------
 # Load Data Functions
 # ---------------------------------------------------------
 
+CSV_DTYPES = {
+    'town': 'category',
+    'flat_type': 'category',
+    'storey_range': 'category',
+}
+
+# Part of the Parquet file name, so changing CSV_DTYPES never reuses a copy
+# written with the old schema
+CSV_SCHEMA_DIGEST = hashlib.sha1(repr(sorted(CSV_DTYPES.items())).encode()).hexdigest()[:8]
+
+def read_csv_cached(csv_path):
+    """Read a CSV via a Parquet copy kept next to it.
+
+    The copy is named after the current CSV_DTYPES, and it is rebuilt when
+    no copy exists for that schema or the CSV is newer than the copy.
+    """
+    csv_path = Path(csv_path)
+    parquet_path = csv_path.with_name(f"{csv_path.stem}-{CSV_SCHEMA_DIGEST}.parquet")
+    if not parquet_path.exists() or parquet_path.stat().st_mtime < csv_path.stat().st_mtime:
+        df = pd.read_csv(csv_path, dtype=CSV_DTYPES)
+        tmp_path = None
+        try:
+            # Write to a temporary file and swap it in, so a failed or concurrent
+            # write never leaves a truncated Parquet file at the final path
+            fd, tmp_path = tempfile.mkstemp(
+                dir=parquet_path.parent, prefix=f".{parquet_path.stem}-", suffix='.parquet'
+            )
+            os.close(fd)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, parquet_path)
+        except OSError:
+            return df  # read-only deployment: fall back to the parsed CSV
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return pd.read_parquet(parquet_path)
+
 @st.cache_data(show_spinner="Loading static 2017–2024 data...")
 def load_static_data():
-    return pd.read_csv("resale_flat_2017_2024.csv")
+    return read_csv_cached("resale_flat_2017_2024.csv")
 
 @st.cache_data(show_spinner="Loading dynamic 2025+ data...")
 def load_dynamic_data():
-    return pd.read_csv("dynamic_2025_data.csv")
+    return read_csv_cached("dynamic_2025_data.csv")
+
+@st.cache_data(show_spinner="Preparing data...")
+def enrich(df):
+    """Add floor level and remaining lease columns used by the filters."""
+    df = df.copy()
+    # Only a handful of distinct storey ranges exist, so categorize each once and
+    # broadcast through the category codes (code -1, i.e. missing, picks "Unknown")
+    storeys = df['storey_range'].astype('category').cat
+    labels = [categorize_storey_range(v) for v in storeys.categories] + ["Unknown"]
+    df['floor_level_category'] = np.asarray(labels, dtype=object)[storeys.codes.values]
+    df['lease_years'] = pd.to_numeric(
+        df['remaining_lease'].str.extract(r'(\d+)\s*year', expand=False), errors='coerce'
+    ).astype('Int16')
+    df['lease_category'] = (
+        pd.cut(df['lease_years'], bins=LEASE_BINS, right=False, labels=LEASE_ORDER)
+        .cat.add_categories("Unknown")
+        .fillna("Unknown")
+    )
+    df['year'] = pd.to_datetime(df['month'], format='%Y-%m-%d').dt.year.astype('int16')
+    return to_categories(df)
+
+@st.cache_data(show_spinner="Merging datasets...")
+def build_full(static_df, dynamic_df):
+    """Combine both datasets (concat falls back to object when category levels differ)."""
+    return to_categories(pd.concat([static_df, dynamic_df], ignore_index=True))
+
+@st.cache_data
+def sidebar_options(df_key, _df):
+    """Distinct values offered by each sidebar filter, in display order."""
+    options = {
+        col: sorted(_df[col].dropna().unique().tolist())
+        for col in ('town', 'flat_type', 'floor_level_category', 'year', 'month')
+    }
+    present = set(_df['lease_category'].dropna().unique())
+    options['lease_category'] = [cat for cat in LEASE_ORDER + ["Unknown"] if cat in present]
+    return options
 
 # ---------------------------------------------------------
 # Main App
@@ -67,18 +131,12 @@ def load_dynamic_data():
 st.set_page_config(page_title="HDB Resale Dashboard", layout="wide")
 st.title("🏠 Singapore HDB Resale Flat Dashboard")
 
-# Load datasets
-static_df = load_static_data()
-dynamic_df = load_dynamic_data()
+# Load and enrich datasets
+static_df = enrich(load_static_data())
+dynamic_df = enrich(load_dynamic_data())
 
 # Merge datasets
-full_df = pd.concat([static_df, dynamic_df], ignore_index=True)
-
-# Enrich data
-for df in [full_df, dynamic_df]:
-    df['floor_level_category'] = df['storey_range'].apply(categorize_storey_range)
-    df['lease_years'] = df['remaining_lease'].apply(extract_lease_years)
-    df['lease_category'] = df['lease_years'].apply(categorize_remaining_lease)
+full_df = build_full(static_df, dynamic_df)
 
 # ---------------------------------------------------------
 # Sidebar Navigation
@@ -90,71 +148,106 @@ option = st.sidebar.selectbox(
 )
 
 # ---------------------------------------------------------
-# Common Section Template
+# Cached Aggregations
 # ---------------------------------------------------------
+# Keyed on the dataset name and the sidebar selection; the filtered frame
+# itself is passed unhashed since it is fully determined by those two.
+# The caches are shared across sessions, so each keeps only recent selections.
+
+@st.cache_data(max_entries=32)
+def price_trend(df_key, filter_state, _filtered_df):
+    """Average resale price per month."""
+    return _filtered_df.groupby('month', observed=True)['resale_price'].mean().reset_index()
+
+@st.cache_data(max_entries=32)
+def town_counts(df_key, filter_state, _filtered_df):
+    """Number of transactions per town, most active first."""
+    counts = _filtered_df['town'].value_counts(sort=True)
+    return counts[counts > 0]  # drop unused category levels
+
+@st.cache_data(max_entries=32)
+def price_summary(df_key, filter_state, _filtered_df):
+    """Min, quartiles and max of resale price per flat type."""
+    stats = _filtered_df.groupby('flat_type', observed=True)['resale_price'].describe()
+    return stats[['min', '25%', '50%', '75%', 'max']].dropna()
+
+@st.cache_data(max_entries=4)
+def csv_bytes(df_key, filter_state, _filtered_df):
+    """Filtered rows encoded as CSV for the download button."""
+    return _filtered_df.to_csv(index=False).encode('utf-8')
 
-def render_section(filtered_df, title_prefix):
-    st.write(f"### {title_prefix} Filtered Results")
-    st.dataframe(filtered_df)
-
-    if not filtered_df.empty:
-        csv = filtered_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download Filtered Data as CSV",
-            data=csv,
-            file_name='filtered_resale_data.csv',
-            mime='text/csv',
-        )
+# ---------------------------------------------------------
+# Common Section Template
+# ---------------------------------------------------------
 
-    # Line Chart
+def render_price_trend(df_key, filter_state, filtered_df, title_prefix):
     st.write(f"### 📈 {title_prefix} Average Resale Price Over Time")
     if 'resale_price' in filtered_df.columns:
-        price_trend = filtered_df.groupby('month')['resale_price'].mean().reset_index()
-        if not price_trend.empty:
-            st.line_chart(price_trend.rename(columns={'month': 'index'}).set_index('index'))
+        trend = price_trend(df_key, filter_state, filtered_df)
+        if not trend.empty:
+            st.line_chart(trend.rename(columns={'month': 'index'}).set_index('index'))
         else:
             st.info("No data available for price trend.")
 
-    # Bar Chart
+def render_town_counts(df_key, filter_state, filtered_df, title_prefix):
     st.write(f"### 🏡 {title_prefix} Transactions Count by Town")
     if 'town' in filtered_df.columns:
-        town_count = filtered_df['town'].value_counts().sort_values(ascending=False)
+        town_count = town_counts(df_key, filter_state, filtered_df)
         if not town_count.empty:
             st.bar_chart(town_count)
         else:
             st.info("No data available for town analysis.")
 
-    # Grouped Boxplot
+def render_flat_type_boxplot(df_key, filter_state, filtered_df, title_prefix):
     st.write(f"### 📦 {title_prefix} Resale Price Distribution by Flat Type (Boxplot)")
     if 'resale_price' in filtered_df.columns and 'flat_type' in filtered_df.columns:
         if not filtered_df.empty:
-            fig, ax = plt.subplots(figsize=(10, 6), facecolor='none')
-
-            resale_by_flat = [group['resale_price'].dropna() for name, group in filtered_df.groupby('flat_type')]
-            flat_labels = sorted(filtered_df['flat_type'].dropna().unique())
-
-            bp = ax.boxplot(resale_by_flat, vert=True, patch_artist=True,
-                            labels=flat_labels,
-                            boxprops=dict(facecolor='none', color='deepskyblue', linewidth=2),
-                            medianprops=dict(color='red', linewidth=2),
-                            whiskerprops=dict(color='white', linewidth=2),
-                            capprops=dict(color='white', linewidth=2),
-                            flierprops=dict(marker='o', markersize=4, markerfacecolor='lightgray', alpha=0.5))
-
-            ax.spines['bottom'].set_color('white')
-            ax.spines['left'].set_color('white')
-            ax.tick_params(axis='x', colors='white', labelrotation=45)
-            ax.tick_params(axis='y', colors='white')
-            ax.set_title("Resale Price Distribution by Flat Type", fontsize=16, fontweight='bold', color='white', pad=15)
-            ax.set_ylabel("Resale Price (SGD)", fontsize=12, color='white')
-            ax.yaxis.set_major_formatter(mtick.StrMethodFormatter('${x:,.0f}'))
-            ax.grid(True, linestyle='--', alpha=0.3, color='lightgrey')
-            ax.set_facecolor('none')
-
-            st.pyplot(fig)
+            stats = price_summary(df_key, filter_state, filtered_df)
+
+            # Boxes are drawn from precomputed quartiles, so only a few numbers per
+            # flat type are sent to the browser; whiskers span the full price range
+            fig = go.Figure(go.Box(
+                x=stats.index.astype(str).tolist(),
+                lowerfence=stats['min'], q1=stats['25%'], median=stats['50%'],
+                q3=stats['75%'], upperfence=stats['max'],
+                fillcolor='rgba(0,0,0,0)',
+                line=dict(color='deepskyblue', width=2),
+            ))
+
+            fig.update_layout(
+                title=dict(text="Resale Price Distribution by Flat Type", font=dict(size=16, color='white')),
+                showlegend=False,
+                height=600,
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='white'),
+            )
+            fig.update_xaxes(tickangle=-45, showline=True, linecolor='white')
+            fig.update_yaxes(title_text="Resale Price (SGD)", tickprefix='$', tickformat=',.0f',
+                             showline=True, linecolor='white',
+                             gridcolor='rgba(211,211,211,0.3)', griddash='dash')
+
+            st.plotly_chart(fig, width='stretch')
         else:
             st.info("No data available for grouped boxplot.")
 
+def render_section(df_key, filter_state, filtered_df, title_prefix):
+    st.write(f"### {title_prefix} Filtered Results")
+    st.dataframe(filtered_df)
+
+    if not filtered_df.empty:
+        csv = csv_bytes(df_key, filter_state, filtered_df)
+        st.download_button(
+            label="📥 Download Filtered Data as CSV",
+            data=csv,
+            file_name='filtered_resale_data.csv',
+            mime='text/csv',
+        )
+
+    render_price_trend(df_key, filter_state, filtered_df, title_prefix)
+    render_town_counts(df_key, filter_state, filtered_df, title_prefix)
+    render_flat_type_boxplot(df_key, filter_state, filtered_df, title_prefix)
+
 # ---------------------------------------------------------
 # Section: 2025 Latest Resale Records
 # ---------------------------------------------------------
@@ -162,44 +255,53 @@ def render_section(filtered_df, title_prefix):
 if option == "2025 Latest Resale Records":
     st.subheader("2025+ Resale Transactions")
 
-    filtered_df = dynamic_df.copy()
-    filtered_df['year'] = pd.to_datetime(filtered_df['month']).dt.year
+    df_key, df = "dynamic", dynamic_df
 
     with st.expander("🔽 Show Filters"):
-        towns = sorted(filtered_df['town'].dropna().unique())
+        options = sidebar_options(df_key, df)
+
+        towns = options['town']
         selected_town = st.selectbox("Select Town:", options=["All"] + towns, key="town_dynamic")
 
-        flat_types = sorted(filtered_df['flat_type'].dropna().unique())
+        flat_types = options['flat_type']
         selected_flat_types = st.multiselect("Select Flat Type(s):", options=flat_types, default=flat_types, key="flat_dynamic")
 
-        floor_levels = sorted(filtered_df['floor_level_category'].dropna().unique())
+        floor_levels = options['floor_level_category']
         selected_floor_levels = st.multiselect("Select Floor Level(s):", options=floor_levels, default=floor_levels, key="floor_dynamic")
 
-        lease_order = ["<60 years", "60-69 years", "70-79 years", "80-89 years", "90+ years"]
-        lease_categories = [cat for cat in lease_order if cat in filtered_df['lease_category'].unique()]
+        lease_categories = options['lease_category']
         selected_lease = st.multiselect("Select Remaining Lease Category:", options=lease_categories, default=lease_categories, key="lease_dynamic")
 
-        years = sorted(filtered_df['year'].dropna().unique())
+        years = options['year']
         selected_years = st.multiselect("Select Year(s):", options=years, default=years, key="year_dynamic")
 
-        available_months = sorted(filtered_df['month'].dropna().unique())
-        selected_months = st.multiselect("Select Month(s):", options=available_months, default=available_months, key="month_dynamic")
+        available_months = options['month']
+        # A checkbox instead of a ~100-option multiselect that starts fully selected
+        if st.checkbox("All months", value=True, key="all_months_dynamic"):
+            selected_months = []
+        else:
+            selected_months = st.multiselect("Select Month(s):", options=available_months, key="month_dynamic")
 
-        # Apply filters
+        # Apply filters as one boolean mask, materializing only the surviving rows.
+        # Multiselects left at their full default match every row and are skipped.
+        mask = np.ones(len(df), dtype=bool)
         if selected_town != "All":
-            filtered_df = filtered_df[filtered_df['town'] == selected_town]
-        if selected_flat_types:
-            filtered_df = filtered_df[filtered_df['flat_type'].isin(selected_flat_types)]
-        if selected_floor_levels:
-            filtered_df = filtered_df[filtered_df['floor_level_category'].isin(selected_floor_levels)]
-        if selected_lease:
-            filtered_df = filtered_df[filtered_df['lease_category'].isin(selected_lease)]
-        if selected_years:
-            filtered_df = filtered_df[filtered_df['year'].isin(selected_years)]
-        if selected_months:
-            filtered_df = filtered_df[filtered_df['month'].isin(selected_months)]
-
-    render_section(filtered_df, title_prefix="2025+")
+            mask &= (df['town'] == selected_town).values
+        if selected_flat_types and len(selected_flat_types) < len(flat_types):
+            mask &= df['flat_type'].isin(selected_flat_types).values
+        if selected_floor_levels and len(selected_floor_levels) < len(floor_levels):
+            mask &= df['floor_level_category'].isin(selected_floor_levels).values
+        if selected_lease and len(selected_lease) < len(lease_categories):
+            mask &= df['lease_category'].isin(selected_lease).values
+        if selected_years and len(selected_years) < len(years):
+            mask &= df['year'].isin(selected_years).values
+        if selected_months and len(selected_months) < len(available_months):
+            mask &= df['month'].isin(selected_months).values
+        filtered_df = df.loc[mask]
+
+    filter_state = (selected_town, tuple(selected_flat_types), tuple(selected_floor_levels),
+                    tuple(selected_lease), tuple(selected_years), tuple(selected_months))
+    render_section(df_key, filter_state, filtered_df, title_prefix="2025+")
 
 # ---------------------------------------------------------
 # Section: View Full Dataset
@@ -208,44 +310,53 @@ if option == "2025 Latest Resale Records":
 elif option == "View Full Dataset":
     st.subheader("Full Resale Dataset (2017 onwards)")
 
-    filtered_df = full_df.copy()
-    filtered_df['year'] = pd.to_datetime(filtered_df['month']).dt.year
+    df_key, df = "full", full_df
 
     with st.expander("🔽 Show Filters"):
-        towns = sorted(filtered_df['town'].dropna().unique())
+        options = sidebar_options(df_key, df)
+
+        towns = options['town']
         selected_town = st.selectbox("Select Town:", options=["All"] + towns, key="town_full")
 
-        flat_types = sorted(filtered_df['flat_type'].dropna().unique())
+        flat_types = options['flat_type']
         selected_flat_types = st.multiselect("Select Flat Type(s):", options=flat_types, default=flat_types, key="flat_full")
 
-        floor_levels = sorted(filtered_df['floor_level_category'].dropna().unique())
+        floor_levels = options['floor_level_category']
         selected_floor_levels = st.multiselect("Select Floor Level(s):", options=floor_levels, default=floor_levels, key="floor_full")
 
-        lease_order = ["<60 years", "60-69 years", "70-79 years", "80-89 years", "90+ years"]
-        lease_categories = [cat for cat in lease_order if cat in filtered_df['lease_category'].unique()]
+        lease_categories = options['lease_category']
         selected_lease = st.multiselect("Select Remaining Lease Category:", options=lease_categories, default=lease_categories, key="lease_full")
 
-        years = sorted(filtered_df['year'].dropna().unique())
+        years = options['year']
         selected_years = st.multiselect("Select Year(s):", options=years, default=years, key="year_full")
 
-        available_months = sorted(filtered_df['month'].dropna().unique())
-        selected_months = st.multiselect("Select Month(s):", options=available_months, default=available_months, key="month_full")
+        available_months = options['month']
+        # A checkbox instead of a ~100-option multiselect that starts fully selected
+        if st.checkbox("All months", value=True, key="all_months_full"):
+            selected_months = []
+        else:
+            selected_months = st.multiselect("Select Month(s):", options=available_months, key="month_full")
 
-        # Apply filters
+        # Apply filters as one boolean mask, materializing only the surviving rows.
+        # Multiselects left at their full default match every row and are skipped.
+        mask = np.ones(len(df), dtype=bool)
         if selected_town != "All":
-            filtered_df = filtered_df[filtered_df['town'] == selected_town]
-        if selected_flat_types:
-            filtered_df = filtered_df[filtered_df['flat_type'].isin(selected_flat_types)]
-        if selected_floor_levels:
-            filtered_df = filtered_df[filtered_df['floor_level_category'].isin(selected_floor_levels)]
-        if selected_lease:
-            filtered_df = filtered_df[filtered_df['lease_category'].isin(selected_lease)]
-        if selected_years:
-            filtered_df = filtered_df[filtered_df['year'].isin(selected_years)]
-        if selected_months:
-            filtered_df = filtered_df[filtered_df['month'].isin(selected_months)]
-
-    render_section(filtered_df, title_prefix="Full")
+            mask &= (df['town'] == selected_town).values
+        if selected_flat_types and len(selected_flat_types) < len(flat_types):
+            mask &= df['flat_type'].isin(selected_flat_types).values
+        if selected_floor_levels and len(selected_floor_levels) < len(floor_levels):
+            mask &= df['floor_level_category'].isin(selected_floor_levels).values
+        if selected_lease and len(selected_lease) < len(lease_categories):
+            mask &= df['lease_category'].isin(selected_lease).values
+        if selected_years and len(selected_years) < len(years):
+            mask &= df['year'].isin(selected_years).values
+        if selected_months and len(selected_months) < len(available_months):
+            mask &= df['month'].isin(selected_months).values
+        filtered_df = df.loc[mask]
+
+    filter_state = (selected_town, tuple(selected_flat_types), tuple(selected_floor_levels),
+                    tuple(selected_lease), tuple(selected_years), tuple(selected_months))
+    render_section(df_key, filter_state, filtered_df, title_prefix="Full")
 
 # ---------------------------------------------------------
 # End